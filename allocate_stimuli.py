@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+from jackknife_rankings import prepare_data, score_to_expression
+from results_writer import ResultsWriter
+
+# 读取数据
+file_path = 'aligned_data.xlsx'
+
+# 下一批需要生成的试次列表数（每位评分者一个列表）
+N_LISTS = 10
+# 每个列表中每个 (性别, 情绪) 的刺激数量；9 对应现有的 90 试次列表
+N_PER_CELL = 9
+# 目标精度：所有 Material 的 Hit Rate 95% CI 宽度都不超过该值
+TARGET_WIDTH = 0.3
+
+Z = 1.96
+# 情绪对应的 Categorizing_Expressions_Score 编码（不含 Other）
+expression_mapping = {e: c for c, e in score_to_expression.items() if e != 'Other'}
+
+
+def material_aggregates(data):
+    """
+    按 Material 汇总命中次数和有效作答次数。
+    选择 Other（6）或未作答的试次不计入 Hit Rate。
+    """
+    data = data[data['Expression_Type'] != 'Other']
+    score = data['Categorizing_Expressions_Score']
+    answered = score.notna() & (score != 6)
+    hits = (score == data['Expression_Type'].map(expression_mapping)) & answered
+    return pd.DataFrame({
+        'Material': data['Material'],
+        'Expressor_Short': data['Expressor_Short'],
+        'Gender': data['Gender'],
+        'Expression_Type': data['Expression_Type'],
+        'Direction': data['Material'].str.extract(r'^(L|R)_', expand=False),
+        'Hits': hits.astype(int),
+        'N': answered.astype(int),
+    }).groupby(['Material', 'Expressor_Short', 'Gender', 'Expression_Type', 'Direction'],
+               as_index=False)[['Hits', 'N']].sum()
+
+
+def wilson_width(hits, n):
+    # Wilson 95% 置信区间宽度；n = 0 时宽度为 1
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = np.where(n > 0, hits / n, 0.5)
+        width = 2 * Z / (1 + Z ** 2 / n) * np.sqrt(p * (1 - p) / n + Z ** 2 / (4 * n ** 2))
+    return np.where(n > 0, width, 1.0)
+
+
+class StimulusAllocator:
+    """
+    根据当前各 Material 的估计精度生成下一批试次列表。
+    每个列表：同一方向（L 或 R），每个 Expressor 最多出现一次，
+    每个 (性别, 情绪) 恰好 n_per_cell 个刺激。
+    优先选择再增加一次评分后 CI 宽度缩小最多的 Material（即 CI 最宽的 Material）。
+    """
+
+    def __init__(self, aggregates, n_per_cell=N_PER_CELL):
+        self.materials = aggregates['Material'].to_numpy()
+        self.hits = aggregates['Hits'].to_numpy(dtype=float)
+        self.n = aggregates['N'].to_numpy(dtype=float)
+        self.n_per_cell = n_per_cell
+        self.expressor_idx, self.expressors = pd.factorize(aggregates['Expressor_Short'])
+        cell = aggregates['Gender'] + '_' + aggregates['Expression_Type']
+        self.cell_idx, self.cells = pd.factorize(cell)
+        self.direction = aggregates['Direction'].to_numpy()
+
+    def priority(self, hits, n):
+        # 假设命中率不变，再增加一次评分带来的 CI 宽度减少量
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = np.where(n > 0, hits / n, 0.5)
+        return wilson_width(hits, n) - wilson_width(hits + p, n + 1)
+
+    def build_list(self, direction, hits, n):
+        # 按优先级从高到低贪心选择，满足每个 Expressor 最多一次、每个单元格 n_per_cell 个
+        candidates = np.flatnonzero(self.direction == direction)
+        order = candidates[np.argsort(-self.priority(hits[candidates], n[candidates]), kind='stable')]
+        used_expressor = np.zeros(len(self.expressors), dtype=bool)
+        cell_count = np.zeros(len(self.cells), dtype=int)
+        chosen = []
+        target = self.n_per_cell * len(self.cells)
+        for m in order:
+            e, c = self.expressor_idx[m], self.cell_idx[m]
+            if used_expressor[e] or cell_count[c] >= self.n_per_cell:
+                continue
+            used_expressor[e] = True
+            cell_count[c] += 1
+            chosen.append(m)
+            if len(chosen) == target:
+                break
+        return np.array(chosen, dtype=int)
+
+    def allocate(self, n_lists=N_LISTS, hits=None, n=None, seed=0):
+        """
+        生成 n_lists 个试次列表，L/R 方向交替以保持平衡。
+        每生成一个列表，按预期增加的评分更新计数，使后续列表覆盖其他 Material。
+        贪心选择的结果按优先级排序，因此每个列表用各自的随机种子（seed + k）打乱试次顺序，
+        避免优先级（即估计精度）与试次位置在所有列表中一一对应。
+        """
+        hits = self.hits.copy() if hits is None else hits.copy()
+        n = self.n.copy() if n is None else n.copy()
+        lists = []
+        for k in range(n_lists):
+            chosen = self.build_list('L' if k % 2 == 0 else 'R', hits, n)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                p = np.where(n[chosen] > 0, hits[chosen] / n[chosen], 0.5)
+            hits[chosen] += p
+            n[chosen] += 1
+            lists.append(np.random.default_rng(seed + k).permutation(chosen))
+        return lists
+
+    def simulate(self, lists_source, target_width=TARGET_WIDTH, max_raters=2000, seed=0):
+        """
+        模拟模式：以当前估计的命中率为真值生成评分，
+        统计达到目标精度（所有 Material 的 CI 宽度 <= target_width）需要多少位新评分者。
+        lists_source 为 'adaptive' 或固定列表的列表（依次轮换）。
+        """
+        rng = np.random.default_rng(seed)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            true_p = np.where(self.n > 0, (self.hits + 0.5) / (self.n + 1), 0.5)
+        hits, n = self.hits.copy(), self.n.copy()
+        for rater in range(max_raters):
+            if wilson_width(hits, n).max() <= target_width:
+                return rater
+            if isinstance(lists_source, str):
+                chosen = self.build_list('L' if rater % 2 == 0 else 'R', hits, n)
+            else:
+                chosen = lists_source[rater % len(lists_source)]
+            hits[chosen] += rng.random(len(chosen)) < true_p[chosen]
+            n[chosen] += 1
+        return max_raters
+
+    def list_table(self, chosen, aggregates):
+        # chosen 已是呈现顺序（见 allocate）
+        table = aggregates.iloc[chosen][['Material', 'Expressor_Short', 'Gender', 'Expression_Type', 'Direction']]
+        table = table.assign(CI_Width=wilson_width(self.hits[chosen], self.n[chosen]))
+        return table.reset_index(drop=True)
+
+
+def current_lists(data, aggregates):
+    # 现有设计中每个 Group 的固定试次列表（按 Material 下标）
+    index = pd.Series(np.arange(len(aggregates)), index=aggregates['Material'])
+    return [index.reindex(group['Material'].unique()).dropna().to_numpy(dtype=int)
+            for _, group in data.groupby('Group')]
+
+
+if __name__ == '__main__':
+    data = prepare_data(pd.read_excel(file_path))
+    aggregates = material_aggregates(data)
+    allocator = StimulusAllocator(aggregates)
+
+    lists = allocator.allocate()
+    with ResultsWriter('next_batch_trial_lists.xlsx', write_csv=False, write_parquet=False) as writer:
+        for k, chosen in enumerate(lists, start=1):
+            writer.add(f'List{k}', allocator.list_table(chosen, aggregates))
+
+    # 模拟：固定轮换现有列表 vs. 自适应分配
+    fixed = allocator.simulate(current_lists(data, aggregates))
+    adaptive = allocator.simulate('adaptive')
+    print(f"达到 CI 宽度 <= {TARGET_WIDTH} 所需的新评分者：固定列表 {fixed} 人，自适应分配 {adaptive} 人")
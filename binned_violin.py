@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+import matplotlib.colors as mcolors
+import matplotlib.pyplot as plt
+from matplotlib.patches import Patch, Polygon, Rectangle
+
+# 读取数据
+file_path = 'aligned_data.xlsx'
+
+# 评分量表范围
+SCALES = {'Arousal_Score': (1, 9), 'Realism_Score': (1, 7)}
+
+# 每个量表单位内的网格点数（整数点正好落在网格上）
+POINTS_PER_UNIT = 32
+# 与 seaborn 相同：密度曲线向数据范围外延伸 cut 倍带宽
+CUT = 2
+# 离散量表的最小带宽（等级间距的比例）；评分很多时 Scott 带宽会小于等级间距，曲线变成一串尖峰
+DISCRETE_MIN_BW = 0.35
+
+palette = {'Enjoyment': '#1F77B4', 'Neutral': '#555555', 'Disgust': '#A14D4D',
+           'Affiliation': '#2CA02C', 'Dominance': '#FF7F0E'}
+order = ['Enjoyment', 'Affiliation', 'Dominance', 'Disgust', 'Neutral']
+
+
+def level_counts(values, low, high):
+    # 离散量表：统计每个整数等级的评分次数（一次 bincount，忽略缺失和超出范围的值）
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values) & (values >= low) & (values <= high)]
+    return np.bincount(np.rint(values - low).astype(int), minlength=high - low + 1)
+
+
+def weighted_quantiles(levels, counts, q):
+    # 由计数直接计算分位数（与 np.percentile 的线性插值结果相同）
+    cum = np.cumsum(counts)
+    n = cum[-1]
+    h = (n - 1) * np.asarray(q, dtype=float)
+    lo = levels[np.searchsorted(cum, np.floor(h), side='right')]
+    hi = levels[np.searchsorted(cum, np.ceil(h), side='right')]
+    return lo + (hi - lo) * (h - np.floor(h))
+
+
+def binned_kde(levels, counts, bw_adjust=1.0, cut=CUT, min_bw=0.0, points_per_unit=POINTS_PER_UNIT):
+    """
+    基于分箱计数的 FFT 核密度估计。
+    计数先线性分配到规则网格上，再与高斯核做 FFT 卷积，
+    计算量只取决于网格大小，与评分条数无关。
+    带宽使用 Scott 规则（与 seaborn/scipy 的默认值相同），且不小于 min_bw。
+    """
+    levels = np.asarray(levels, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    n = counts.sum()
+    mean = (levels * counts).sum() / n
+    sd = np.sqrt((counts * (levels - mean) ** 2).sum() / max(n - 1, 1))
+    bw = max(bw_adjust * sd * n ** (-1 / 5), min_bw)
+    if bw <= 0:
+        # 所有评分相同：退化为网格步长的窄峰
+        bw = 1.0 / points_per_unit
+
+    step = 1.0 / points_per_unit
+    start = np.floor((levels.min() - cut * bw) / step) * step
+    stop = np.ceil((levels.max() + cut * bw) / step) * step
+    grid = np.arange(start, stop + step / 2, step)
+
+    # 线性分箱
+    pos = (levels - start) / step
+    left = np.clip(np.floor(pos).astype(int), 0, len(grid) - 1)
+    frac = pos - left
+    right = np.clip(left + 1, 0, len(grid) - 1)
+    binned = np.bincount(left, weights=counts * (1 - frac), minlength=len(grid))
+    binned += np.bincount(right, weights=counts * frac, minlength=len(grid))
+
+    # 高斯核，截断在 ±4 倍带宽
+    half = int(np.ceil(4 * bw / step))
+    offsets = np.arange(-half, half + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bw) ** 2) / (bw * np.sqrt(2 * np.pi))
+
+    size = len(binned) + len(kernel) - 1
+    n_fft = 1 << (size - 1).bit_length()
+    conv = np.fft.irfft(np.fft.rfft(binned, n_fft) * np.fft.rfft(kernel, n_fft), n_fft)
+    density = np.maximum(conv[half:half + len(grid)], 0) / n
+    return grid, density
+
+
+def violin_stats(values=None, levels=None, counts=None, scale=None, bw_adjust=1.0, cut=CUT, min_bw=0.0):
+    """
+    计算一把小提琴和箱线图所需的全部统计量。
+    可以直接传入原始评分 values（需给出 scale=(最低, 最高)），
+    也可以传入各等级的 levels 和 counts。
+    非整数数据（例如每个 Material 的平均分）按原值计算分位数并线性分箱。
+    离散量表数据的带宽不小于 DISCRETE_MIN_BW。
+    """
+    if values is not None:
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if scale is not None and np.all(values == np.rint(values)):
+            low, high = scale
+            levels = np.arange(low, high + 1)
+            counts = level_counts(values, low, high)
+            min_bw = max(min_bw, DISCRETE_MIN_BW)
+        else:
+            levels, counts = np.unique(values, return_counts=True)
+    levels = np.asarray(levels, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    keep = counts > 0
+    levels, counts = levels[keep], counts[keep]
+    if counts.sum() == 0:
+        return None
+
+    q1, median, q3 = weighted_quantiles(levels, counts, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = (levels >= q1 - 1.5 * iqr) & (levels <= q3 + 1.5 * iqr)
+    grid, density = binned_kde(levels, counts, bw_adjust=bw_adjust, cut=cut, min_bw=min_bw)
+    return {'grid': grid, 'density': density, 'n': int(counts.sum()),
+            'q1': q1, 'median': median, 'q3': q3,
+            'whisker_low': levels[inside].min(), 'whisker_high': levels[inside].max()}
+
+
+def grouped_violin_stats(data, value_col, group_cols, scale, bw_adjust=1.0, cut=CUT):
+    """
+    对试次级数据按分组一次性统计各等级的计数，再对每个分组计算小提琴统计量。
+    返回 {分组键: stats}。
+    """
+    low, high = scale
+    values = pd.to_numeric(data[value_col], errors='coerce')
+    valid = values.between(low, high)
+    level_idx = np.rint(values[valid] - low).astype(int)
+    group_idx, groups = pd.MultiIndex.from_frame(data.loc[valid, group_cols]).factorize()
+    counts = np.zeros((len(groups), high - low + 1))
+    np.add.at(counts, (group_idx, level_idx.to_numpy()), 1)
+
+    levels = np.arange(low, high + 1)
+    return {key if len(group_cols) > 1 else key[0]:
+            violin_stats(levels=levels, counts=counts[g], bw_adjust=bw_adjust, cut=cut, min_bw=DISCRETE_MIN_BW)
+            for g, key in enumerate(groups)}
+
+
+def draw_violin(ax, stats, position, color, width=0.8, scale=1.0, side='both', box=True, box_width=0.1):
+    """
+    将预先计算的形状作为多边形画到坐标轴上。
+    scale 为密度到半宽的换算系数；side 为 'both'、'left' 或 'right'（分裂小提琴）。
+    """
+    if stats is None:
+        return
+    half_width = stats['density'] * scale * width / 2
+    y = stats['grid']
+    left = position - half_width if side in ('both', 'left') else np.full_like(y, position)
+    right = position + half_width if side in ('both', 'right') else np.full_like(y, position)
+    xy = np.concatenate([np.column_stack([right, y]), np.column_stack([left[::-1], y[::-1]])])
+    ax.add_patch(Polygon(xy, closed=True, facecolor=color, edgecolor='gray', linewidth=0.8))
+
+    if box:
+        offset = {'both': 0, 'left': -box_width / 2, 'right': box_width / 2}[side]
+        x = position + offset
+        ax.plot([x, x], [stats['whisker_low'], stats['q1']], color='black', lw=1)
+        ax.plot([x, x], [stats['q3'], stats['whisker_high']], color='black', lw=1)
+        ax.add_patch(Rectangle((x - box_width / 2, stats['q1']), box_width, stats['q3'] - stats['q1'],
+                               facecolor=color, edgecolor='black', linewidth=1, zorder=3))
+        ax.plot([x - box_width / 2, x + box_width / 2], [stats['median']] * 2, color='white', lw=1.5, zorder=4)
+
+
+def violinplot(ax, stats_by_group, order, palette, hue_order=None, width=0.8, density_norm='area'):
+    """
+    绘制一组小提琴图。stats_by_group 的键为类别（或有 hue 时为 (类别, hue)）。
+    density_norm='area' 时所有小提琴使用同一换算系数（与 seaborn 默认相同），
+    'width' 时每把小提琴的最大宽度相同。
+    """
+    all_stats = [s for s in stats_by_group.values() if s is not None]
+    global_max = max(s['density'].max() for s in all_stats)
+    for i, category in enumerate(order):
+        keys = [(category, h) for h in hue_order] if hue_order else [category]
+        sides = ['left', 'right'] if hue_order and len(hue_order) == 2 else ['both'] * len(keys)
+        for key, side in zip(keys, sides):
+            stats = stats_by_group.get(key)
+            if stats is None:
+                continue
+            norm = global_max if density_norm == 'area' else stats['density'].max()
+            color = palette[category]
+            if hue_order and side == 'right':
+                color = _lighten(color)
+            draw_violin(ax, stats, i, color, width=width, scale=1.0 / norm, side=side)
+    ax.set_xticks(range(len(order)))
+    ax.set_xticklabels(order)
+    ax.set_xlim(-0.5, len(order) - 0.5)
+
+
+def _lighten(color, amount=0.45):
+    rgb = np.array(mcolors.to_rgb(color))
+    return tuple(rgb + (1 - rgb) * amount)
+
+
+if __name__ == '__main__':
+    # 试次级（每一条评分）的小提琴图：按情绪类型，左右两半分别为女性和男性 Expressor
+    data = pd.read_excel(file_path)
+    data['Expression_Type'] = data['Material'].apply(lambda x: 'Disgust' if 'dis' in x else
+                                                     'Enjoyment' if 'enj' in x else
+                                                     'Affiliation' if 'aff' in x else
+                                                     'Dominance' if 'dom' in x else
+                                                     'Neutral' if 'neu' in x else 'Other')
+    data['Expressor_Gender'] = np.where(data['Material'].str.contains('Fema'), 'Female', 'Male')
+    data = data[data['Expression_Type'] != 'Other']
+    hue_order = ['Female', 'Male']
+
+    plt.figure(figsize=(16, 6))
+    for k, (column, title) in enumerate([('Arousal_Score', 'Arousal Scores by Expression Type (All Ratings)'),
+                                         ('Realism_Score', 'Plausibility Scores by Expression Type (All Ratings)')]):
+        ax = plt.subplot(1, 2, k + 1)
+        stats = grouped_violin_stats(data, column, ['Expression_Type', 'Expressor_Gender'], SCALES[column])
+        violinplot(ax, stats, order, palette, hue_order=hue_order)
+        low, high = SCALES[column]
+        ax.set_ylim(low, high)
+        ax.set_title(title, fontsize=15, fontweight='bold')
+        ax.set_xlabel('Expression Type', fontsize=12, fontweight='bold')
+        ax.set_ylabel(column.replace('_', ' '), fontsize=12, fontweight='bold')
+        ax.legend(handles=[Patch(facecolor='gray', label='Female (left)'),
+                           Patch(facecolor=_lighten('gray'), label='Male (right)')], loc='lower right')
+
+    plt.tight_layout()
+    plt.savefig('trial_level_violin_plots.png', dpi=300)
+    plt.show()
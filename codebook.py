@@ -0,0 +1,210 @@
+import glob
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+# 代码本文件所在目录（默认与脚本同目录）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 编译后的代码本缓存文件名
+CACHE_FILE = '.codebook_cache.pkl'
+
+# 缓存格式版本，修改编译逻辑时递增
+CACHE_VERSION = 2
+
+# SoSci 中“未作答”的编码
+NOT_ANSWERED = -9
+
+
+class Codebook:
+    """
+    编译后的 SoSci 代码本。
+    每个有取值表的变量保存为紧凑的查找数组：
+    labels[code - offset] 为该编码的含义，valid[code - offset] 表示该编码是否在代码本中定义。
+    """
+
+    def __init__(self, variables, lookups):
+        self.variables = variables  # DataFrame: VAR, LABEL, TYPE, INPUT, QUESTION
+        self.lookups = lookups      # dict: VAR -> (offset, labels, valid)
+
+    def __contains__(self, var):
+        return var in self.lookups
+
+    def labels(self, var):
+        # 返回 {编码: 含义} 字典（不含未定义的编码）
+        offset, labels, valid = self.lookups[var]
+        codes = np.flatnonzero(valid) + offset
+        return dict(zip(codes.tolist(), labels[valid].tolist()))
+
+    def code_range(self, var):
+        # 返回有效作答编码的最小值和最大值（不含 -9）
+        codes = [c for c in self.labels(var) if c != NOT_ANSWERED]
+        return min(codes), max(codes)
+
+    def decode(self, values, var, not_answered=np.nan):
+        """
+        通过数组索引将编码列解码为文字标签。
+        values: 编码列（Series 或数组），var: 代码本中的变量名（如 'DC01'）
+        未定义或缺失的编码返回 NaN，-9 返回 not_answered。
+        """
+        offset, labels, valid = self.lookups[var]
+        codes = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+
+        idx = codes - offset
+        ok = np.isfinite(idx) & (idx >= 0) & (idx < len(labels))
+        idx = np.where(ok, idx, 0).astype(np.intp)
+        ok &= valid[idx]
+
+        out = np.where(ok, labels[idx], np.nan).astype(object)
+        out[codes == NOT_ANSWERED] = not_answered
+
+        if isinstance(values, pd.Series):
+            return pd.Series(out, index=values.index, name=values.name)
+        return out
+
+
+def find_codebook_files(directory=BASE_DIR):
+    # 查找目录中最新的 variables_*.csv 和 values_*.csv
+    variables_files = sorted(glob.glob(os.path.join(directory, 'variables_*.csv')))
+    values_files = sorted(glob.glob(os.path.join(directory, 'values_*.csv')))
+    if not variables_files or not values_files:
+        raise FileNotFoundError(f"在 {directory} 中找不到 variables_*.csv 或 values_*.csv")
+    return variables_files[-1], values_files[-1]
+
+
+def read_sosci_table(path):
+    # SoSci 代码本为 UTF-16 编码、制表符分隔
+    return pd.read_csv(path, sep='\t', encoding='utf-16', dtype=str, keep_default_na=False)
+
+
+def compile_codebook(variables_path, values_path):
+    variables = read_sosci_table(variables_path)
+    values = read_sosci_table(values_path)
+    values['RESPONSE'] = values['RESPONSE'].astype(int)
+
+    lookups = {}
+    for var, group in values.groupby('VAR', sort=False):
+        codes = group['RESPONSE'].to_numpy()
+        offset = codes.min()
+        labels = np.full(codes.max() - offset + 1, np.nan, dtype=object)
+        valid = np.zeros(len(labels), dtype=bool)
+        labels[codes - offset] = group['MEANING'].to_numpy()
+        valid[codes - offset] = True
+        lookups[var] = (offset, labels, valid)
+
+    return Codebook(variables, lookups)
+
+
+def _source_key(paths):
+    # 用文件路径、大小和修改时间判断缓存是否过期
+    return tuple((os.path.abspath(p), os.path.getsize(p), os.path.getmtime(p)) for p in paths)
+
+
+def load_codebook(variables_path=None, values_path=None, cache_path=None):
+    """
+    读取并编译代码本；编译结果按源文件缓存到磁盘，源文件不变时直接读取缓存。
+    """
+    if variables_path is None or values_path is None:
+        variables_path, values_path = find_codebook_files()
+    if cache_path is None:
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(values_path)), CACHE_FILE)
+
+    key = (CACHE_VERSION, _source_key([variables_path, values_path]))
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_key, variables, lookups = pickle.load(f)
+            if cached_key == key:
+                return Codebook(variables, lookups)
+        except Exception as e:
+            print(f"读取代码本缓存时出错，将重新编译：{e}")
+
+    codebook = compile_codebook(variables_path, values_path)
+    try:
+        with open(cache_path, 'wb') as f:
+            # 只缓存普通数据（变量表和查找数组），不缓存 Codebook 实例：
+            # 以脚本运行时类会被记为 __main__.Codebook，其他模块无法读取
+            pickle.dump((key, codebook.variables, codebook.lookups), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        print(f"无法写入代码本缓存：{e}")
+    return codebook
+
+
+def load_export(path):
+    # 读取 SoSci 导出的数据文件；第二行是变量说明，跳过
+    data = pd.read_excel(path, skiprows=[1])
+    return data
+
+
+def validate_export(data, codebook):
+    """
+    一次性向量化检查导出数据是否与代码本一致。
+    返回问题列表 DataFrame，列为 VAR, Issue, Code, Count：
+      missing_variable   代码本中有、数据中没有的变量
+      unexpected_variable 数据中有、代码本中没有的变量
+      unknown_code       编码在取值范围内但代码本未定义
+      out_of_range       编码超出该变量的取值范围
+    """
+    issues = []
+
+    expected = set(codebook.variables['VAR'])
+    present = set(data.columns)
+    for var in sorted(expected - present):
+        issues.append({'VAR': var, 'Issue': 'missing_variable', 'Code': np.nan, 'Count': 0})
+    for var in sorted(present - expected):
+        issues.append({'VAR': var, 'Issue': 'unexpected_variable', 'Code': np.nan, 'Count': 0})
+
+    coded_vars = [var for var in data.columns if var in codebook]
+    if coded_vars:
+        # 把所有编码变量的 valid 表按统一的 offset 堆叠成一个二维查找表
+        offset = min(codebook.lookups[v][0] for v in coded_vars)
+        width = max(codebook.lookups[v][0] + len(codebook.lookups[v][2]) for v in coded_vars) - offset
+        valid_table = np.zeros((len(coded_vars), width), dtype=bool)
+        low = np.empty(len(coded_vars))
+        high = np.empty(len(coded_vars))
+        for j, var in enumerate(coded_vars):
+            var_offset, _, valid = codebook.lookups[var]
+            valid_table[j, var_offset - offset:var_offset - offset + len(valid)] = valid
+            low[j], high[j] = codebook.code_range(var)
+
+        codes = data[coded_vars].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        observed = np.isfinite(codes) & (codes != NOT_ANSWERED)
+
+        idx = codes - offset
+        in_table = observed & (idx >= 0) & (idx < width)
+        cols = np.broadcast_to(np.arange(len(coded_vars)), codes.shape)
+        defined = np.zeros(codes.shape, dtype=bool)
+        defined[in_table] = valid_table[cols[in_table], idx[in_table].astype(np.intp)]
+
+        out_of_range = observed & ((codes < low) | (codes > high))
+        unknown = observed & ~defined & ~out_of_range
+
+        for issue, mask in (('unknown_code', unknown), ('out_of_range', out_of_range)):
+            rows, cols_hit = np.nonzero(mask)
+            if len(rows) == 0:
+                continue
+            found = pd.DataFrame({'VAR': np.asarray(coded_vars)[cols_hit], 'Code': codes[rows, cols_hit]})
+            counts = found.groupby(['VAR', 'Code']).size().reset_index(name='Count')
+            counts['Issue'] = issue
+            issues.extend(counts.to_dict('records'))
+
+    return pd.DataFrame(issues, columns=['VAR', 'Issue', 'Code', 'Count'])
+
+
+if __name__ == '__main__':
+    # 示例：检查目录中最新的导出文件
+    codebook = load_codebook()
+    export_files = sorted(glob.glob(os.path.join(BASE_DIR, 'data_JGFacialExpressionsRating_*.xlsx')))
+    if not export_files:
+        print("找不到导出数据文件。")
+    else:
+        data = load_export(export_files[-1])
+        report = validate_export(data, codebook)
+        if report.empty:
+            print("导出数据与代码本一致。")
+        else:
+            print("发现以下问题：")
+            print(report.to_string(index=False))
+        print(codebook.decode(data['DC01'], 'DC01').value_counts())
@@ -0,0 +1,188 @@
+import hashlib
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+# 刺激图片所在文件夹（可包含多个子文件夹）
+stimulus_folders = [r'C:\Users\neuro-lab\Top_Expressors']
+# 按 Material 汇总评分所用的数据
+aligned_data_path = 'aligned_data.xlsx'
+# 特征缓存文件（特征按文件哈希索引，另存 (路径, 大小, 修改时间) -> 哈希 的索引）
+feature_cache_path = 'image_features_cache.pkl'
+
+file_extensions = ['.png']
+
+# 特征列
+FEATURE_COLUMNS = ['Mean_Luminance', 'RMS_Contrast', 'HF_Energy_Ratio', 'LR_Asymmetry', 'Width', 'Height']
+
+# 高空间频率的起始半径（以 Nyquist 频率的比例计）
+HF_CUTOFF = 0.25
+
+
+def file_hash(path):
+    # 通过内存映射读取文件并计算 SHA-1，避免把大文件整体读入内存
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            h.update(m)
+    return h.hexdigest()
+
+
+def scan_stimuli(folders):
+    # 遍历文件夹，收集所有刺激图片
+    paths = []
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            for file in files:
+                if any(file.lower().endswith(ext) for ext in file_extensions):
+                    paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def compute_features(path):
+    """
+    计算一张图片的低层特征：
+    Mean_Luminance  平均亮度（0-1）
+    RMS_Contrast    亮度标准差（RMS 对比度）
+    HF_Energy_Ratio 高空间频率能量占总能量（去除直流分量）的比例
+    LR_Asymmetry    左半脸与镜像右半脸的平均绝对差
+    """
+    with Image.open(path) as img:
+        gray = np.asarray(img.convert('L'), dtype=np.float32) / 255.0
+    height, width = gray.shape
+
+    mean_luminance = float(gray.mean())
+    rms_contrast = float(gray.std())
+
+    # 空间频率能量：rfft2 只计算一半频谱
+    power = np.abs(np.fft.rfft2(gray - mean_luminance)) ** 2
+    fy = np.fft.fftfreq(height)[:, None]
+    fx = np.fft.rfftfreq(width)[None, :]
+    radius = np.sqrt(fx ** 2 + fy ** 2) / 0.5
+    total = power.sum()
+    hf_ratio = float(power[radius > HF_CUTOFF].sum() / total) if total > 0 else np.nan
+
+    # 左右对称性：左半边与右半边水平翻转后比较
+    half = width // 2
+    left = gray[:, :half]
+    right = gray[:, width - half:][:, ::-1]
+    asymmetry = float(np.abs(left - right).mean()) if half > 0 else np.nan
+
+    return {'Mean_Luminance': mean_luminance, 'RMS_Contrast': rms_contrast,
+            'HF_Energy_Ratio': hf_ratio, 'LR_Asymmetry': asymmetry,
+            'Width': width, 'Height': height}
+
+
+def _compute_row(item):
+    path, digest = item
+    try:
+        row = compute_features(path)
+    except Exception as e:
+        print(f"处理图片 {path} 时出错：{e}")
+        return None
+    row['Hash'] = digest
+    return row
+
+
+def load_cache(path):
+    # 返回 (特征表, 文件索引)；旧版缓存只有特征表
+    features = pd.DataFrame(columns=['Hash'] + FEATURE_COLUMNS)
+    index = pd.DataFrame(columns=['Path', 'Size', 'MTime', 'Hash'])
+    if os.path.exists(path):
+        cached = pd.read_pickle(path)
+        if isinstance(cached, dict):
+            features, index = cached['features'], cached['index']
+        else:
+            features = cached
+    return features, index
+
+
+def hash_files(paths, index):
+    """
+    计算文件哈希；路径、大小和修改时间都与索引一致的文件直接使用索引中的哈希，
+    只有新增或修改过的文件才会重新读取。返回 (哈希列表, 新索引)。
+    """
+    known = {(p, s, m): h for p, s, m, h in index[['Path', 'Size', 'MTime', 'Hash']].itertuples(index=False)}
+    rows = []
+    for path in paths:
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        digest = known.get(key)
+        if digest is None:
+            digest = file_hash(path)
+        rows.append(key + (digest,))
+    new_index = pd.DataFrame(rows, columns=['Path', 'Size', 'MTime', 'Hash'])
+    return new_index['Hash'].tolist(), new_index
+
+
+def extract_features(folders, cache_path=feature_cache_path, max_workers=None, chunksize=16):
+    """
+    提取所有刺激图片的特征。未变化的文件不重新读取和计算哈希，
+    已计算过的图片（按文件哈希）直接读取缓存，只有新增或修改过的图片会送入进程池计算。
+    """
+    paths = scan_stimuli(folders)
+    cache, index = load_cache(cache_path)
+    hashes, new_index = hash_files(paths, index)
+
+    known = set(cache['Hash'])
+    # 相同内容的图片只计算一次
+    todo = list({h: (p, h) for p, h in zip(paths, hashes) if h not in known}.values())
+
+    if todo:
+        print(f"需要计算 {len(todo)} 张新图片（已缓存 {len(known)} 张）。")
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            rows = [r for r in pool.map(_compute_row, todo, chunksize=chunksize) if r is not None]
+        if rows:
+            cache = pd.concat([cache, pd.DataFrame(rows)], ignore_index=True)
+    if todo or not new_index.equals(index):
+        pd.to_pickle({'features': cache, 'index': new_index}, cache_path)
+
+    files = pd.DataFrame({'Path': paths, 'Hash': hashes})
+    files['Stimulus'] = files['Path'].apply(lambda p: os.path.splitext(os.path.basename(p))[0])
+    return files.merge(cache, on='Hash', how='left')
+
+
+def material_aggregates(data):
+    # 按 Material 计算平均评分（与 generate_Bar_Violin_plot.py 相同的汇总方式）
+    return data.groupby('Material').agg(
+        Arousal_Score=('Arousal_Score', 'mean'),
+        Realism_Score=('Realism_Score', 'mean'),
+        N_Ratings=('Material', 'size')
+    ).reset_index()
+
+
+def join_features(features, aggregates):
+    """
+    将图片特征与 Material 汇总结果合并。
+    Material 形如 'L_disFema2'；如果图片文件名不含 L_/R_ 方向前缀，
+    则去掉 Material 的前缀后再匹配。
+    """
+    aggregates = aggregates.copy()
+    if features['Stimulus'].str.match(r'^(L|R)_').any():
+        aggregates['Stimulus'] = aggregates['Material']
+    else:
+        aggregates['Stimulus'] = aggregates['Material'].str.replace(r'^(L|R)_', '', regex=True)
+    features = features.drop(columns=['Path']).drop_duplicates('Stimulus')
+    return aggregates.merge(features, on='Stimulus', how='left')
+
+
+if __name__ == '__main__':
+    features = extract_features(stimulus_folders)
+    features.to_csv('image_features.csv', index=False)
+
+    data = pd.read_excel(aligned_data_path)
+    merged = join_features(features, material_aggregates(data))
+    merged.to_csv('image_features_by_material.csv', index=False)
+
+    unmatched = merged['Hash'].isna().sum()
+    if unmatched > 0:
+        print(f"警告：{unmatched} 个 Material 找不到对应的图片。")
+
+    # 图片特征与评分的相关
+    print(merged[FEATURE_COLUMNS[:4] + ['Arousal_Score', 'Realism_Score']].corr().round(3))
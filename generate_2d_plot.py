@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from results_writer import ResultsWriter
 
 # 读取数据
 file_path = 'aligned_data.xlsx'  # 请替换成你的实际文件路径
@@ -42,9 +43,10 @@ for col in chosen_order:
 confusion_matrix = confusion_matrix[chosen_order]
 confusion_matrix = confusion_matrix.reindex(intended_order)
 
-# 将混淆矩阵保存为文件（可选）
-confusion_matrix.to_csv('confusion_matrix_HitRate.csv')
-confusion_matrix.to_excel('confusion_matrix_HitRate.xlsx')
+# 将混淆矩阵保存为文件（可选），在后台写出；文件名带 _2d，避免与 generate_3d_plot.py 的输出互相覆盖
+writer = ResultsWriter('results_2d_plot.xlsx')
+writer.add('confusion_matrix_HitRate_2d', confusion_matrix, index=True)
+writer.submit_workbook()
 
 # ----------------------------
 # 绘制二维热图
@@ -68,3 +70,6 @@ plt.savefig('confusion_matrix_2d_heatmap.png', dpi=300, bbox_inches='tight')
 
 # 显示图像
 plt.show()
+
+# 等待后台写出完成
+writer.close()
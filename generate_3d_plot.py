@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
+from results_writer import ResultsWriter
 
 # Optimized color scheme for better discriminability and aesthetics
 optimized_colors = {
@@ -53,9 +54,11 @@ for col in chosen_order:
 confusion_matrix = confusion_matrix[chosen_order]
 confusion_matrix = confusion_matrix.reindex(intended_order)
 
-# Save confusion matrix for reference
-confusion_matrix.to_csv('confusion_matrix_HitRate.csv')
-confusion_matrix.to_excel('confusion_matrix_HitRate.xlsx')
+# Save confusion matrix for reference (written in the background; the _3d suffix keeps
+# generate_2d_plot.py's copy from being overwritten)
+writer = ResultsWriter('results_3d_plot.xlsx')
+writer.add('confusion_matrix_HitRate_3d', confusion_matrix, index=True)
+writer.submit_workbook()
 
 # Prepare 3D plot data
 x_labels = confusion_matrix.columns
@@ -124,4 +127,8 @@ ax.view_init(elev=30, azim=45)
 
 # Save and display the plot
 plt.savefig('confusion_matrix_3d_plot_final.png', dpi=300, format='png', bbox_inches='tight')
+
 plt.show()
+
+# Wait for background writes
+writer.close()
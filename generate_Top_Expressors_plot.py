@@ -2,6 +2,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+from results_writer import ResultsWriter
 
 # 读取数据
 file_path = "N:/JinLab/Personal_JG_Lab/R_course/Facial Expressions Rating Task/aligned_data.xlsx"
@@ -119,8 +120,9 @@ arousal_stats = data_filtered.groupby(['Gender', 'Expression_Type']).agg(
     Var_Arousal=('Arousal_Score', 'var')
 ).reset_index()
 
-# 保存 Arousal 统计结果
-arousal_stats.to_csv("gender_emotion_arousal_stats.csv", index=False)
+# 保存 Arousal 统计结果（Parquet/CSV 在后台写出）
+writer = ResultsWriter("top_expressors_results.xlsx")
+writer.add("gender_emotion_arousal_stats", arousal_stats)
 
 # 打印 Arousal 统计结果
 print("Arousal Scores Statistics by Gender and Emotion:")
@@ -140,8 +142,9 @@ gender_stats = final_summary.groupby('Gender').agg(
 ).reset_index()
 
 # 保存结果
-gender_stats.to_csv("gender_summary_stats.csv", index=False)
-final_summary.to_csv("final_summary_data.csv", index=False)
+writer.add("gender_summary_stats", gender_stats)
+writer.add("final_summary_data", final_summary)
+writer.submit_workbook()
 
 # 可视化部分（按三行一列排列，并调整图例位置）
 def plot_combined_data(df):
@@ -182,6 +185,9 @@ def plot_combined_data(df):
 # 绘制图表
 plot_combined_data(final_summary)
 
+# 等待后台写出完成
+writer.close()
+
 
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from results_writer import ResultsWriter
+
+# 输出文件（与 Distribution of Expressor Numbers_Versions A and B.py 读取的工作簿格式相同）
+output_path = 'Trials_E1_Serpentine_LR_generated.xlsx'
+
+# 刺激编码中的情绪缩写
+emotion_codes = ['enj', 'aff', 'dom', 'dis', 'neu']
+
+# 默认 Expressor 池：现有设计中的 45 位女性和 45 位男性
+default_pool = [f'Fema{i}' for i in range(2, 92, 2)] + [f'Male{i}' for i in range(1, 91, 2)]
+
+# 每批生成并评分的候选设计数量
+N_CANDIDATES = 2000
+
+
+def pool_arrays(pool):
+    # 将 Expressor 池拆分为性别编码（0 = Fema, 1 = Male）
+    pool = np.asarray(pool)
+    gender = np.where(np.char.startswith(pool.astype(str), 'Fema'), 0, 1)
+    return pool, gender
+
+
+def latin_square_assignments(gender, n_settings, n_candidates, rng):
+    """
+    批量生成 Latin square 情绪分配。
+    返回 (latin, emotion_order)：latin[k, s, j] 为候选 k 的 Setting s 中 Expressor j 的 Latin square 取值（0-4），
+    对应的情绪为 emotion_order[k, latin[k, s, j]]。
+    每个性别内随机排列 Expressor，按位置取模得到 Latin square 的行号，Setting s 中的取值为 (行号 + s) mod 5。
+    这样每个 Setting 内各情绪在每个性别中的数量相差不超过 1，
+    且连续 5 个 Setting 中每个 Expressor 的五种情绪各出现一次。
+    """
+    n_expr = len(gender)
+    n_emotions = len(emotion_codes)
+    keys = rng.random((n_candidates, n_expr)) + gender[None, :] * 2
+    order = np.argsort(keys, axis=1)
+    position = np.empty_like(order)
+    np.put_along_axis(position, order, np.arange(n_expr)[None, :], axis=1)
+    # 每个性别内部的位置
+    position -= np.where(gender == 1, (gender == 0).sum(), 0)[None, :]
+    row = position % n_emotions
+
+    emotion_order = np.argsort(rng.random((n_candidates, n_emotions)), axis=1)
+    latin = (row[:, None, :] + np.arange(n_settings)[None, :, None]) % n_emotions
+    return latin, emotion_order
+
+
+def interleaved_slots(counts, offset):
+    """
+    构造一个 Setting 的试次位置序列：slot[t] 为位置 t 上的 (性别, Latin square 取值) 单元格编号（性别 * 5 + 取值）。
+    位置 t 优先使用单元格 ((t + offset) mod 2, (t + offset) mod 5)，即情绪按循环顺序交错、性别交替出现；
+    由于 2 与 5 互素，每 10 个试次恰好覆盖全部 10 个单元格。
+    该单元格已用完时，从剩余单元格中选择与上一试次情绪不同（其次性别不同）且剩余数量最多的单元格。
+    counts 为 (2, 5) 数组，表示每个单元格的 Expressor 数量。
+    """
+    remaining = np.array(counts, dtype=int)
+    n_emotions = remaining.shape[1]
+    slots = []
+    prev_g, prev_v = -1, -1
+    for t in range(remaining.sum()):
+        g, v = (t + offset) % 2, (t + offset) % n_emotions
+        if remaining[g, v] == 0 or v == prev_v:
+            cells = [(gg, vv) for gg in range(2) for vv in range(n_emotions) if remaining[gg, vv] > 0]
+            # 依次比较：情绪不同、性别不同、剩余数量
+            g, v = max(cells, key=lambda c: (c[1] != prev_v, c[0] != prev_g, remaining[c]))
+        remaining[g, v] -= 1
+        slots.append(g * n_emotions + v)
+        prev_g, prev_v = g, v
+    return np.array(slots)
+
+
+def interleaved_orders(latin, gender, rng):
+    """
+    批量生成试次顺序：trial_order[k, s, t] 为候选 k 的 Setting s 中第 t 个试次的 Expressor 下标。
+    每个 Setting 的单元格序列由 interleaved_slots 确定（同一 Setting 的所有候选相同），
+    候选之间只有同一单元格内 Expressor 的先后顺序不同（随机）。
+    """
+    n_candidates, n_settings, n_expr = latin.shape
+    n_emotions = len(emotion_codes)
+    cell = gender[None, None, :] * n_emotions + latin
+    # 按单元格分组、组内随机排列的 Expressor
+    expressors = np.argsort(cell + rng.random(latin.shape), axis=2)
+    trial_order = np.empty_like(expressors)
+    for s in range(n_settings):
+        # 每个单元格的 Expressor 数量在所有候选中相同（见 latin_square_assignments）
+        counts = np.bincount(cell[0, s], minlength=2 * n_emotions).reshape(2, n_emotions)
+        positions = np.argsort(interleaved_slots(counts, offset=s), kind='stable')
+        trial_order[:, s, positions] = expressors[:, s, :]
+    return trial_order
+
+
+def score_designs(emotion, gender, trial_order):
+    """
+    为候选设计批量评分（越低越好）：
+    - 相邻试次情绪相同的次数
+    - 相邻试次性别相同的次数（权重较低）
+    - 各情绪在试次序列中平均位置的离散程度（顺序效应）
+    - 各 Expressor 在所有 Setting 中平均位置的离散程度（避免同一 Expressor 总是出现在开头或结尾）
+    emotion: (K, S, T)，trial_order: (K, S, T) 为每个 Setting 的试次顺序
+    """
+    ordered_emotion = np.take_along_axis(emotion, trial_order, axis=2)
+    ordered_gender = gender[trial_order]
+    same_emotion = (ordered_emotion[..., 1:] == ordered_emotion[..., :-1]).sum(axis=(1, 2))
+    same_gender = (ordered_gender[..., 1:] == ordered_gender[..., :-1]).sum(axis=(1, 2))
+
+    n_trials = trial_order.shape[2]
+    middle = (n_trials - 1) / 2
+    positions = np.arange(n_trials)[None, None, :]
+    position_spread = np.zeros(emotion.shape[0])
+    for e in range(len(emotion_codes)):
+        mask = ordered_emotion == e
+        count = mask.sum(axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_pos = np.where(count > 0, (mask * positions).sum(axis=2) / count, middle)
+        position_spread += np.abs(mean_pos - middle).mean(axis=1)
+
+    expressor_pos = np.empty_like(trial_order)
+    np.put_along_axis(expressor_pos, trial_order, np.broadcast_to(positions, trial_order.shape), axis=2)
+    expressor_spread = np.abs(expressor_pos.mean(axis=1) - middle).mean(axis=1)
+
+    return same_emotion + 0.25 * same_gender + (position_spread + expressor_spread) / n_trials
+
+
+def generate_design(pool=default_pool, n_settings=5, n_candidates=N_CANDIDATES, n_rounds=5, seed=0):
+    """
+    生成 n_settings 个 Setting 的试次列表，每个 Setting 有 A（L 方向）和 B（R 方向，蛇形顺序，即 A 的逆序）两个版本。
+    试次顺序直接构造（见 interleaved_slots），Expressor 池平衡时相邻试次的情绪和性别都不相同；
+    随机搜索只用于在这些设计中选择情绪和 Expressor 位置最平衡的一个：
+    每轮批量生成 n_candidates 个候选设计并向量化评分，保留最优设计。
+    返回 (设计 dict, 最优得分)，设计 dict 的键为工作表名，值为 DataFrame。
+    """
+    rng = np.random.default_rng(seed)
+    pool, gender = pool_arrays(pool)
+
+    best_score, best = np.inf, None
+    for _ in range(n_rounds):
+        latin, emotion_order = latin_square_assignments(gender, n_settings, n_candidates, rng)
+        emotion = np.take_along_axis(emotion_order[:, None, :].repeat(n_settings, axis=1), latin, axis=2)
+        trial_order = interleaved_orders(latin, gender, rng)
+        scores = score_designs(emotion, gender, trial_order)
+        k = int(np.argmin(scores))
+        if scores[k] < best_score:
+            best_score, best = scores[k], (emotion[k], trial_order[k])
+
+    emotion, trial_order = best
+    sheets = {}
+    for s in range(n_settings):
+        order = trial_order[s]
+        codes = np.char.add(np.asarray(emotion_codes)[emotion[s, order]], pool[order])
+        sti_column = f'Sti_Setting{s + 1}'
+        sheets[f'Setting{s + 1}_A'] = pd.DataFrame({sti_column: np.char.add('L_', codes)})
+        sheets[f'Setting{s + 1}_B'] = pd.DataFrame({sti_column: np.char.add('R_', codes[::-1])})
+    check_design(sheets)
+    return sheets, best_score
+
+
+def check_design(sheets):
+    # 检查每个版本中没有重复的 Expressor，L/R 方向与版本一致，且相邻试次的情绪不同
+    for sheet_name, df in sheets.items():
+        sti = df.iloc[:, 0]
+        expressors = sti.str.extract(r'((?:Fema|Male)\d+)$', expand=False)
+        if expressors.duplicated().any():
+            raise ValueError(f"工作表 {sheet_name} 中有重复的 Expressor")
+        direction = 'L' if sheet_name.endswith('_A') else 'R'
+        if not sti.str.startswith(direction + '_').all():
+            raise ValueError(f"工作表 {sheet_name} 中的方向不一致")
+        emotions = sti.str.extract(r'^[LR]_([a-z]{3})', expand=False)
+        if (emotions.to_numpy()[1:] == emotions.to_numpy()[:-1]).any():
+            raise ValueError(f"工作表 {sheet_name} 中有相邻试次的情绪相同")
+
+
+def design_summary(sheets):
+    # 每个 Setting/版本中各 (性别, 情绪) 的刺激数量
+    rows = []
+    for sheet_name, df in sheets.items():
+        sti = df.iloc[:, 0]
+        counts = pd.crosstab(sti.str.extract(r'(Fema|Male)', expand=False),
+                             sti.str.extract(r'(aff|enj|dis|neu|dom)', expand=False))
+        for gender, row in counts.iterrows():
+            rows.append({'Sheet': sheet_name, 'Gender': gender, **row.to_dict()})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    sheets, score = generate_design()
+    print(f"最优设计得分: {score:.3f}")
+    print(design_summary(sheets).to_string(index=False))
+
+    with ResultsWriter(output_path, write_csv=False, write_parquet=False) as writer:
+        for sheet_name, df in sheets.items():
+            writer.add(sheet_name, df)
@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+from results_writer import ResultsWriter
+
+# 读取数据
+file_path = 'aligned_data.xlsx'
+
+# 预期的情绪类别（与 generate_Top_Expressors_plot.py 相同）
+expected_emotions = ['Affiliation', 'Disgust', 'Dominance', 'Enjoyment', 'Neutral']
+# Categorizing_Expressions_Score 编码对应的情绪（6 = Other）
+score_to_expression = {1: 'Enjoyment', 2: 'Affiliation', 3: 'Dominance', 4: 'Disgust', 5: 'Neutral', 6: 'Other'}
+
+# 每个性别选出的 Top Expressors 数量
+TOP_K = 30
+
+
+def prepare_data(data):
+    # 从 Material 列中提取 Expressor、性别和情绪类型信息
+    data = data.copy()
+    data['Expression_Type'] = data['Material'].apply(lambda x:
+        'Disgust' if 'dis' in x else
+        'Enjoyment' if 'enj' in x else
+        'Affiliation' if 'aff' in x else
+        'Dominance' if 'dom' in x else
+        'Neutral' if 'neu' in x else 'Other'
+    )
+    data['Expressor'] = data['Material'].str.extract(r'(Fema\d+|Male\d+)', expand=False)
+    data = data[data['Expressor'].notna()]
+    data['Gender'] = np.where(data['Expressor'].str.startswith('Fema'), 'Female', 'Male')
+    data['Expressor_Short'] = data['Expressor'].str.replace('Fema', 'F').str.replace('Male', 'M')
+    return data
+
+
+def build_count_tensors(data):
+    """
+    一次遍历数据，建立每位评分者（CASE）对每个 Expressor 的贡献：
+    counts[r, e, i, c]  评分者 r 对 Expressor e 的混淆矩阵计数（意图 i，选择 c，不含 Other）
+    hits[r, e], answered[r, e]       命中次数和计入 Hit Rate 的作答次数
+    realism_sum[r, e], realism_n[r, e] 真实感评分之和与个数
+    """
+    raters, rater_idx = np.unique(data['CASE'].to_numpy(), return_inverse=True)
+    expressor_idx, expressors = pd.factorize(data['Expressor_Short'], sort=True)
+    genders = data.groupby('Expressor_Short')['Gender'].first().reindex(expressors).to_numpy()
+    n_r, n_e, n_k = len(raters), len(expressors), len(expected_emotions)
+
+    emotion_code = {emotion: k for k, emotion in enumerate(expected_emotions)}
+    intended = data['Expression_Type'].map(emotion_code).to_numpy(dtype=float)
+    score = data['Categorizing_Expressions_Score'].to_numpy(dtype=float)
+    chosen = pd.Series(score).map(score_to_expression).map(emotion_code).to_numpy(dtype=float)
+
+    counts = np.zeros((n_r, n_e, n_k, n_k))
+    ok = ~np.isnan(intended) & ~np.isnan(chosen)
+    np.add.at(counts, (rater_idx[ok], expressor_idx[ok], intended[ok].astype(int), chosen[ok].astype(int)), 1)
+
+    # Hit Rate 的计算方式与 generate_Top_Expressors_plot.py 相同：选择 Other 不计入，其余不匹配均计为 0
+    intended_score = data['Expression_Type'].map({e: c for c, e in score_to_expression.items() if e != 'Other'})
+    correct = (score == intended_score.to_numpy(dtype=float)).astype(float)
+    answered = score != 6
+    hits = np.zeros((n_r, n_e))
+    answered_n = np.zeros((n_r, n_e))
+    np.add.at(hits, (rater_idx[answered], expressor_idx[answered]), correct[answered])
+    np.add.at(answered_n, (rater_idx, expressor_idx), answered.astype(float))
+
+    realism = data['Realism_Score'].to_numpy(dtype=float)
+    has_realism = ~np.isnan(realism)
+    realism_sum = np.zeros((n_r, n_e))
+    realism_n = np.zeros((n_r, n_e))
+    np.add.at(realism_sum, (rater_idx[has_realism], expressor_idx[has_realism]), realism[has_realism])
+    np.add.at(realism_n, (rater_idx[has_realism], expressor_idx[has_realism]), 1)
+
+    return {'raters': raters, 'expressors': np.asarray(expressors), 'genders': genders,
+            'counts': counts, 'hits': hits, 'answered': answered_n,
+            'realism_sum': realism_sum, 'realism_n': realism_n}
+
+
+def average_uhr(counts):
+    # 对最后两维为混淆矩阵的张量批量计算 UHR，并在情绪上取平均（忽略无法计算的情绪）
+    a = np.diagonal(counts, axis1=-2, axis2=-1)
+    row = counts.sum(axis=-1)
+    col = counts.sum(axis=-2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        uhr = np.where((row > 0) & (col > 0), (a / row) * (a / col), np.nan)
+        n_valid = (~np.isnan(uhr)).sum(axis=-1)
+        return np.where(n_valid > 0, np.nansum(uhr, axis=-1) / n_valid, np.nan)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _zscore(x):
+    # 在 Expressor 维度上标准化（与 R 的 scale() 相同，使用样本标准差）
+    mean = np.nanmean(x, axis=-1, keepdims=True)
+    sd = np.nanstd(x, axis=-1, ddof=1, keepdims=True)
+    return (x - mean) / sd
+
+
+def summary_scores(counts, hits, answered, realism_sum, realism_n):
+    """
+    根据（可能已减去某位评分者的）计数计算每个 Expressor 的指标。
+    所有参数的前导维度可以是任意批量维度，最后一维（除混淆矩阵外）为 Expressor。
+    """
+    uhr = average_uhr(counts)
+    hit_rate = _ratio(hits, answered)
+    realism = _ratio(realism_sum, realism_n)
+    with np.errstate(invalid='ignore'):
+        arcsine_uhr = np.arcsin(np.sqrt(uhr))
+    combined = (_zscore(arcsine_uhr) + _zscore(realism)) / 2
+    return {'Average_UHR': uhr, 'Hit_Rate': hit_rate, 'Avg_Realism': realism, 'Combined_Score': combined}
+
+
+def rank_within_gender(score, genders):
+    # 在每个性别内按得分从高到低排名（1 为最好），缺失得分排在最后
+    ranks = np.zeros(score.shape)
+    for gender in np.unique(genders):
+        cols = np.flatnonzero(genders == gender)
+        s = np.where(np.isnan(score[..., cols]), -np.inf, score[..., cols])
+        order = np.argsort(-s, axis=-1, kind='stable')
+        r = np.empty_like(order)
+        np.put_along_axis(r, order, np.arange(1, len(cols) + 1), axis=-1)
+        ranks[..., cols] = r
+    return ranks
+
+
+def jackknife(tensors, rank_by='Combined_Score', top_k=TOP_K):
+    """
+    留一评分者（leave-one-rater-out）刀切法。
+    总计数减去每位评分者自己的贡献（downdating），一次性批量得到所有留一样本的指标，
+    不需要对每位评分者重新计算交叉表。
+    """
+    keys = ['counts', 'hits', 'answered', 'realism_sum', 'realism_n']
+    full = summary_scores(*(tensors[k].sum(axis=0) for k in keys))
+    loo = summary_scores(*(tensors[k].sum(axis=0)[None] - tensors[k] for k in keys))
+
+    genders = tensors['genders']
+    full_rank = rank_within_gender(full[rank_by], genders)
+    loo_rank = rank_within_gender(loo[rank_by], genders)
+    change = loo_rank - full_rank[None]
+    max_change = np.abs(change).max(axis=0)
+    n = len(tensors['raters'])
+
+    result = pd.DataFrame({
+        'Expressor_Short': tensors['expressors'],
+        'Gender': genders,
+        'Full_Rank': full_rank.astype(int),
+        'Mean_LOO_Rank': loo_rank.mean(axis=0),
+        'Min_LOO_Rank': loo_rank.min(axis=0).astype(int),
+        'Max_LOO_Rank': loo_rank.max(axis=0).astype(int),
+        'Max_Abs_Rank_Change': max_change.astype(int),
+        'Prop_Rank_Changed': (change != 0).mean(axis=0),
+        'Prop_In_Top_K': (loo_rank <= top_k).mean(axis=0),
+        # 排名从未变化的 Expressor 没有“最有影响”的评分者
+        'Most_Influential_CASE': pd.Series(tensors['raters'][np.abs(change).argmax(axis=0)]).astype('Int64')
+                                 .where(max_change > 0),
+    })
+    for metric in ['Average_UHR', 'Hit_Rate', 'Avg_Realism', 'Combined_Score']:
+        values = loo[metric]
+        result[metric] = full[metric]
+        # 刀切法标准误：sqrt((n-1)/n * Σ(θ_i - θ̄)^2)
+        result[f'{metric}_Jackknife_SE'] = np.sqrt((n - 1) / n * np.nansum(
+            (values - np.nanmean(values, axis=0)) ** 2, axis=0))
+
+    result = result.sort_values(['Gender', 'Full_Rank']).reset_index(drop=True)
+
+    per_rater = pd.DataFrame({
+        'CASE': tensors['raters'],
+        'Rank_Changes': (change != 0).sum(axis=1),
+        'Max_Abs_Rank_Change': np.abs(change).max(axis=1).astype(int),
+        'Top_K_Changes': ((loo_rank <= top_k) != (full_rank <= top_k)[None]).sum(axis=1),
+    }).sort_values('Max_Abs_Rank_Change', ascending=False).reset_index(drop=True)
+
+    return result, per_rater
+
+
+if __name__ == '__main__':
+    data = prepare_data(pd.read_excel(file_path))
+    tensors = build_count_tensors(data)
+    stability, per_rater = jackknife(tensors)
+
+    print("Expressor 排名稳定性（留一评分者）：")
+    print(stability.to_string(index=False))
+
+    with ResultsWriter('jackknife_ranking_stability.xlsx') as writer:
+        writer.add('expressor_rank_stability', stability)
+        writer.add('rater_influence', per_rater)
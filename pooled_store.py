@@ -0,0 +1,246 @@
+import glob
+import os
+import re
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from codebook import load_codebook, load_export, validate_export
+from jackknife_rankings import expected_emotions
+
+# 本地数据仓库目录（按 Wave/Version 分区的 Parquet）
+STORE_DIR = 'pooled_store'
+
+# 每个导出文件的时间戳即为 Wave 标签
+EXPORT_PATTERN = re.compile(r'data_JGFacialExpressionsRating_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2})')
+
+# 与 data_Pre_aligned.R 相同的列
+case_column = 'CASE'
+group_column = 'LG02_01'
+n_settings = 5
+
+emotion_abbr = {'enj': 'Enjoyment', 'aff': 'Affiliation', 'dom': 'Dominance', 'dis': 'Disgust', 'neu': 'Neutral'}
+# 代码本中 Other 的标签为小写
+label_fixes = {'other': 'Other'}
+
+
+def wave_label(path):
+    match = EXPORT_PATTERN.search(os.path.basename(path))
+    if match is None:
+        raise ValueError(f"无法从文件名中识别 Wave：{path}")
+    return match.group(1)
+
+
+def align_export(data, wave, codebook):
+    """
+    将一份 SoSci 导出转换为试次级长表（与 data_Pre_aligned.R 的对齐方式相同），
+    并加入 Wave、Group、Setting、Version 以及由 Material 解析出的列。
+    Chosen_Expression 由代码本解码 DCxx 列得到。
+    """
+    lg04_columns = sorted(c for c in data.columns if re.fullmatch(r'LG04_\d+', c))
+    n = len(lg04_columns)
+    suffixes = [c.split('_')[1] for c in lg04_columns]
+
+    def stacked(prefix):
+        columns = [f'{prefix}{s}' for s in suffixes]
+        values = data.reindex(columns=columns).apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        # -9 为“未作答”
+        return np.where(values == -9, np.nan, values).ravel()
+
+    def decoded(prefix):
+        # 每列用各自的代码本变量解码；代码本中没有的列为缺失
+        columns = [f'{prefix}{s}' for s in suffixes]
+        labels = np.column_stack([codebook.decode(data[c], c) if c in data.columns and c in codebook
+                                  else np.full(len(data), np.nan, dtype=object) for c in columns])
+        return pd.Series(labels.ravel()).replace(label_fixes).to_numpy()
+
+    aligned = pd.DataFrame({
+        'CASE': np.repeat(pd.to_numeric(data[case_column], errors='coerce').to_numpy(), n),
+        'Group': np.repeat(pd.to_numeric(data[group_column], errors='coerce').to_numpy(), n),
+        'Trial': np.tile(np.arange(1, n + 1), len(data)),
+        'Material': data[lg04_columns].to_numpy(dtype=object).ravel(),
+        'Realism_Score': stacked('CI'),
+        'Categorizing_Expressions_Score': stacked('DC'),
+        'Arousal_Score': stacked('RA'),
+        'Chosen_Expression': decoded('DC'),
+    })
+    aligned = aligned[aligned['Material'].notna() & aligned['Group'].notna()]
+    aligned['Material'] = aligned['Material'].astype(str)
+
+    parts = aligned['Material'].str.extract(r'^(?P<Direction>L|R)_(?P<Emotion>[a-z]{3})(?P<Expressor>(?:Fema|Male)\d+)$')
+    aligned['Direction'] = parts['Direction']
+    aligned['Expression_Type'] = parts['Emotion'].map(emotion_abbr).fillna('Other')
+    aligned['Expressor'] = parts['Expressor']
+    # 无法解析的 Material（例如注意力检查）性别保持缺失
+    aligned['Expressor_Gender'] = parts['Expressor'].str[:4].map({'Fema': 'Female', 'Male': 'Male'})
+
+    # Group 1-5 为 Setting1-5 的 A 版本（L），Group 6-10 为 B 版本（R）
+    group = aligned['Group'].astype(int)
+    aligned['Group'] = group
+    aligned['Setting'] = (group - 1) % n_settings + 1
+    aligned['Version'] = np.where(group <= n_settings, 'A', 'B')
+    aligned['Wave'] = wave
+    return aligned.reset_index(drop=True)
+
+
+def ingest(path, store_dir=STORE_DIR, overwrite=False, codebook=None):
+    """
+    将一份导出文件写入数据仓库，作为 Wave=<时间戳>/Version=<A|B> 分区。
+    已存在的 Wave 默认跳过；overwrite=True 时重新写入。
+    未给出 codebook 时读取默认代码本。
+    先写入临时目录，完成后再移动到 Wave 目录，因此中途失败不会留下被当作已导入的半个 Wave。
+    """
+    if codebook is None:
+        codebook = load_codebook()
+    wave = wave_label(path)
+    wave_dir = os.path.join(store_dir, f'Wave={wave}')
+    if os.path.exists(wave_dir) and not overwrite:
+        print(f"Wave {wave} 已存在，跳过。")
+        return 0
+
+    data = load_export(path)
+    issues = validate_export(data, codebook)
+    problems = issues[issues['Issue'].isin(['unknown_code', 'out_of_range'])]
+    if not problems.empty:
+        print(f"警告：{os.path.basename(path)} 中有 {int(problems['Count'].sum())} 个编码与代码本不一致。")
+
+    aligned = align_export(data, wave, codebook)
+    table = pa.Table.from_pandas(aligned, preserve_index=False)
+    # 以 _ 开头的目录在扫描数据仓库时会被忽略
+    tmp_dir = os.path.join(store_dir, f'_tmp_Wave={wave}')
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    pq.write_to_dataset(table, root_path=tmp_dir, partition_cols=['Wave', 'Version'])
+    if os.path.exists(wave_dir):
+        shutil.rmtree(wave_dir)
+    os.replace(os.path.join(tmp_dir, f'Wave={wave}'), wave_dir)
+    shutil.rmtree(tmp_dir)
+    print(f"已写入 Wave {wave}：{len(aligned)} 条评分。")
+    return len(aligned)
+
+
+def ingest_all(pattern='data_JGFacialExpressionsRating_*.xlsx', store_dir=STORE_DIR, overwrite=False):
+    codebook = load_codebook()
+    total = 0
+    for path in sorted(glob.glob(pattern)):
+        total += ingest(path, store_dir=store_dir, overwrite=overwrite, codebook=codebook)
+    return total
+
+
+def _columns(by, extra):
+    # 合并分组列与所需列，去掉重复
+    return list(dict.fromkeys(list(by) + extra))
+
+
+class PooledStore:
+    """
+    跨 Wave 的查询层。筛选条件在扫描时下推：
+    Wave/Version 为分区列，不满足的分区目录不会被读取；其余条件在读取行组时过滤。
+    filters 为 dict，值可以是单个值或列表，例如 {'Wave': ['2025-04-28_22-34'], 'Group': [1, 2]}。
+    """
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.dataset = ds.dataset(store_dir, format='parquet', partitioning='hive')
+
+    def _expression(self, filters):
+        expression = None
+        for column, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            term = ds.field(column).isin(list(values))
+            expression = term if expression is None else expression & term
+        return expression
+
+    def scan(self, columns=None, filters=None):
+        return self.dataset.to_table(columns=columns, filter=self._expression(filters))
+
+    def waves(self):
+        return sorted(pc.unique(self.scan(columns=['Wave'])['Wave']).to_pylist())
+
+    def rating_means(self, by=('Wave', 'Expression_Type'), filters=None):
+        # 平均 Arousal/Realism 评分
+        by = list(by)
+        table = self.scan(columns=by + ['Arousal_Score', 'Realism_Score'], filters=filters)
+        result = table.group_by(by).aggregate([
+            ('Arousal_Score', 'mean'), ('Arousal_Score', 'stddev'), ('Arousal_Score', 'count'),
+            ('Realism_Score', 'mean'), ('Realism_Score', 'stddev'), ('Realism_Score', 'count'),
+        ])
+        return result.to_pandas().sort_values(by).reset_index(drop=True)
+
+    def hit_rates(self, by=('Wave', 'Expression_Type'), filters=None):
+        # Hit Rate：选择 Other 与未作答的试次不计入
+        by = list(by)
+        table = self.scan(columns=_columns(by, ['Expression_Type', 'Chosen_Expression']), filters=filters)
+        chosen = table['Chosen_Expression']
+        answered = pc.and_(pc.is_valid(chosen), pc.not_equal(chosen, 'Other'))
+        table = table.filter(pc.and_(answered, pc.not_equal(table['Expression_Type'], 'Other')))
+        hit = pc.cast(pc.equal(table['Chosen_Expression'], table['Expression_Type']), pa.int64())
+        table = table.append_column('Hit', hit)
+        result = table.group_by(by).aggregate([('Hit', 'sum'), ('Hit', 'count')])
+        result = result.to_pandas().rename(columns={'Hit_sum': 'Hits', 'Hit_count': 'N'})
+        result['Hit_Rate'] = result['Hits'] / result['N']
+        return result.sort_values(by).reset_index(drop=True)
+
+    def confusion_counts(self, by=('Wave',), filters=None):
+        # UHR 计数张量（长表）：每个分组下 (意图, 选择) 的次数，不含 Other
+        by = list(by)
+        table = self.scan(columns=_columns(by, ['Expression_Type', 'Chosen_Expression']), filters=filters)
+        table = table.filter(pc.and_(pc.not_equal(table['Expression_Type'], 'Other'),
+                                     pc.and_(pc.is_valid(table['Chosen_Expression']),
+                                             pc.not_equal(table['Chosen_Expression'], 'Other'))))
+        table = table.append_column('One', pa.array(np.ones(len(table), dtype=np.int64)))
+        result = table.group_by(_columns(by, ['Expression_Type', 'Chosen_Expression'])).aggregate([('One', 'sum')])
+        return result.to_pandas().rename(columns={'One_sum': 'Count'})
+
+    def uhr(self, by=('Wave',), filters=None):
+        """
+        由计数张量计算每个分组、每种情绪的 UHR 和机会水平 UHR，
+        计算方式与 generate_Top_Expressors_plot.py 相同。
+        """
+        by = list(by)
+        counts = self.confusion_counts(by, filters)
+        if by:
+            group_idx, groups = pd.MultiIndex.from_frame(counts[by]).factorize()
+        else:
+            group_idx, groups = np.zeros(len(counts), dtype=int), [()]
+        code = {e: k for k, e in enumerate(expected_emotions)}
+        tensor = np.zeros((len(groups), len(expected_emotions), len(expected_emotions)))
+        np.add.at(tensor, (group_idx, counts['Expression_Type'].map(code).to_numpy(),
+                           counts['Chosen_Expression'].map(code).to_numpy()), counts['Count'].to_numpy())
+
+        a = np.diagonal(tensor, axis1=1, axis2=2)
+        row = tensor.sum(axis=2)
+        col = tensor.sum(axis=1)
+        total = tensor.sum(axis=(1, 2))[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            valid = (row > 0) & (col > 0)
+            uhr = np.where(valid, (a / row) * (a / col), np.nan)
+            chance = np.where(valid, (row / total) * (col / total), np.nan)
+
+        result = pd.DataFrame({
+            'Expression_Type': np.tile(expected_emotions, len(groups)),
+            'UHR': uhr.ravel(),
+            'Chance_UHR': chance.ravel(),
+        })
+        if by:
+            keys = pd.DataFrame(list(groups), columns=by).loc[np.repeat(np.arange(len(groups)), len(expected_emotions))]
+            result = pd.concat([keys.reset_index(drop=True), result], axis=1)
+        result['Performance_Above_Chance'] = result['UHR'] - result['Chance_UHR']
+        return result
+
+
+if __name__ == '__main__':
+    # 用法：python pooled_store.py [导出文件通配符]
+    pattern = sys.argv[1] if len(sys.argv) > 1 else 'data_JGFacialExpressionsRating_*.xlsx'
+    ingest_all(pattern)
+
+    store = PooledStore()
+    print("已有的 Wave：", store.waves())
+    print(store.hit_rates(by=['Wave', 'Version', 'Expression_Type']).to_string(index=False))
+    print(store.uhr(by=['Wave', 'Expressor_Gender']).to_string(index=False))
+    print(store.rating_means(by=['Wave', 'Expression_Type']).to_string(index=False))
@@ -0,0 +1,149 @@
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Excel 工作表名最长 31 个字符，且不能包含以下字符
+SHEET_NAME_MAX = 31
+INVALID_SHEET_CHARS = r'[\[\]\:\*\?\/\\]'
+
+
+class ResultsWriter:
+    """
+    收集一次运行中的所有结果表，统一写出：
+    - 一个 xlsxwriter 工作簿（constant_memory 模式，逐行写出，每个表一个工作表）
+    - 每个表一份 Parquet（供程序读取），可选同时写 CSV（保持原有文件名）
+    Parquet/CSV 和工作簿都在后台线程中写出，不会阻塞后续绘图。
+
+    用法：
+        writer = ResultsWriter('results.xlsx')
+        writer.add('final_summary_data', final_summary)
+        ...
+        writer.submit_workbook()  # 所有表登记完毕，开始在后台写出工作簿
+        plt.show()
+        writer.close()            # 等待后台写出完成
+    """
+
+    def __init__(self, workbook_path, output_dir=None, write_csv=True, write_parquet=True):
+        self.workbook_path = workbook_path
+        self.output_dir = output_dir if output_dir is not None else (os.path.dirname(workbook_path) or '.')
+        self.write_csv = write_csv
+        self.write_parquet = write_parquet
+        self.tables = {}
+        self._futures = []
+        self._workbook_submitted = False
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def add(self, name, df, index=False):
+        # 登记结果表，并立即在后台写出 Parquet/CSV
+        if name in self.tables:
+            raise ValueError(f"结果表 {name} 已存在")
+        if self._workbook_submitted:
+            raise ValueError(f"工作簿已开始写出，无法再添加结果表 {name}")
+        # 保存副本，避免调用方之后原地修改 DataFrame 时与后台写出冲突
+        df = df.reset_index() if index else df.copy()
+        self.tables[name] = df
+        self._futures.append(self._executor.submit(self._write_files, name, df))
+        return df
+
+    def _write_files(self, name, df):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.write_csv:
+            df.to_csv(os.path.join(self.output_dir, f'{name}.csv'), index=False)
+        if self.write_parquet:
+            try:
+                # Parquet 列名必须是字符串
+                df.rename(columns=str).to_parquet(os.path.join(self.output_dir, f'{name}.parquet'), index=False)
+            except ImportError as e:
+                print(f"无法写出 Parquet（需要 pyarrow）：{e}")
+                self.write_parquet = False
+
+    def wait(self):
+        # 等待后台写出完成，并抛出其中的异常
+        for future in self._futures:
+            future.result()
+        self._futures = []
+
+    def write_workbook(self):
+        import xlsxwriter
+
+        workbook = xlsxwriter.Workbook(self.workbook_path, {'constant_memory': True, 'nan_inf_to_errors': True})
+        header_format = workbook.add_format({'bold': True})
+        used_names = set()
+        for name, df in self.tables.items():
+            worksheet = workbook.add_worksheet(_sheet_name(name, used_names))
+            worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+            # constant_memory 模式要求按行顺序写出
+            for row_idx, row in enumerate(_iter_rows(df), start=1):
+                worksheet.write_row(row_idx, 0, row)
+        workbook.close()
+
+    def submit_workbook(self):
+        # 在后台线程中写出工作簿（排在已登记的 Parquet/CSV 之后）；之后不能再添加结果表
+        if not self._workbook_submitted:
+            self._workbook_submitted = True
+            self._futures.append(self._executor.submit(self.write_workbook))
+
+    def close(self):
+        try:
+            self.submit_workbook()
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
+
+
+def _sheet_name(name, used_names):
+    # 生成合法且不重复的工作表名
+    base = re.sub(INVALID_SHEET_CHARS, '_', name)[:SHEET_NAME_MAX]
+    sheet, i = base, 1
+    while sheet.lower() in used_names:
+        suffix = f'_{i}'
+        sheet = base[:SHEET_NAME_MAX - len(suffix)] + suffix
+        i += 1
+    used_names.add(sheet.lower())
+    return sheet
+
+
+def _iter_rows(df):
+    # 将缺失值写为空单元格，时间戳写为字符串
+    for row in df.itertuples(index=False, name=None):
+        yield [None if _is_missing(v) else (str(v) if isinstance(v, pd.Timestamp) else v) for v in row]
+
+
+def _is_missing(value):
+    # 包括 None、NaN、NaT 和可空类型（Int64、boolean 等）中的 pd.NA
+    return pd.api.types.is_scalar(value) and pd.isna(value)
+
+
+def collect_files(paths, workbook_path):
+    # 将已有的结果文件（例如 R 脚本输出的 CSV）合并到一个工作簿中
+    with ResultsWriter(workbook_path, write_csv=False) as writer:
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if path.lower().endswith('.csv'):
+                writer.add(name, pd.read_csv(path))
+            else:
+                for sheet, df in pd.read_excel(path, sheet_name=None).items():
+                    writer.add(f'{name}_{sheet}', df)
+
+
+if __name__ == '__main__':
+    # 示例：python results_writer.py all_results.xlsx *.csv
+    if len(sys.argv) < 3:
+        print("用法：python results_writer.py 输出工作簿.xlsx 结果文件1.csv [结果文件2.xlsx ...]")
+        sys.exit(1)
+    files = [p for pattern in sys.argv[2:] for p in sorted(glob.glob(pattern))]
+    collect_files(files, sys.argv[1])
+    print(f"已写出 {sys.argv[1]}（{len(files)} 个文件）")
@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from jackknife_rankings import expected_emotions, prepare_data, score_to_expression
+from results_writer import ResultsWriter
+
+# 读取数据
+file_path = 'aligned_data.xlsx'
+
+# 每个性别选出的 Expressor 数量
+N_PER_GENDER = 30
+# 每种情绪下已选 Expressor 的平均 Arousal 允许范围（按性别分别检查），格式为 {情绪: (下限, 上限)}。
+# 为 None 时使用数据中该情绪所有 Expressor 的平均 Arousal ± AROUSAL_TOLERANCE，
+# 即要求选出的子集在唤起度上代表整个刺激池。
+AROUSAL_RANGE = None
+AROUSAL_TOLERANCE = 0.25
+# 目标函数中 UHR 和 Plausibility 的权重
+WEIGHTS = {'UHR': 1.0, 'Realism': 1.0}
+
+
+def score_table(data):
+    """
+    计算每个 (Expressor, 情绪) 的 UHR、Hit Rate、平均 Realism 和平均 Arousal。
+    UHR 的计算方式与 generate_Top_Expressors_plot.py 相同（排除 Other）。
+    """
+    expressor_idx, expressors = pd.factorize(data['Expressor_Short'], sort=True)
+    emotion_code = {emotion: k for k, emotion in enumerate(expected_emotions)}
+    intended = data['Expression_Type'].map(emotion_code).to_numpy(dtype=float)
+    chosen = data['Categorizing_Expressions_Score'].map(score_to_expression).map(emotion_code).to_numpy(dtype=float)
+
+    n_e, n_k = len(expressors), len(expected_emotions)
+    counts = np.zeros((n_e, n_k, n_k))
+    ok = ~np.isnan(intended) & ~np.isnan(chosen)
+    np.add.at(counts, (expressor_idx[ok], intended[ok].astype(int), chosen[ok].astype(int)), 1)
+
+    a = np.diagonal(counts, axis1=1, axis2=2)
+    row = counts.sum(axis=2)
+    col = counts.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        uhr = np.where((row > 0) & (col > 0), (a / row) * (a / col), np.nan)
+        hit_rate = np.where(row > 0, a / row, np.nan)
+
+    table = pd.DataFrame({
+        'Expressor_Short': np.repeat(np.asarray(expressors), n_k),
+        'Expression_Type': np.tile(expected_emotions, n_e),
+        'UHR': uhr.ravel(),
+        'Hit_Rate': hit_rate.ravel(),
+    })
+    means = data[data['Expression_Type'] != 'Other'].groupby(['Expressor_Short', 'Gender', 'Expression_Type']).agg(
+        Avg_Realism=('Realism_Score', 'mean'),
+        Avg_Arousal=('Arousal_Score', 'mean')
+    ).reset_index()
+    return means.merge(table, on=['Expressor_Short', 'Expression_Type'], how='left')
+
+
+class SubsetSelector:
+    """
+    在 (Expressor, 情绪) 得分表上选择最优的刺激子集。
+    每个被选中的 Expressor 提供全部五种情绪，因此情绪自然平衡；
+    约束为每个性别选出 n_per_gender 个 Expressor，且每个 (性别, 情绪) 下的平均 Arousal 在给定范围内。
+    目标为所有入选刺激的 z(UHR) 与 z(Realism) 加权和。
+
+    得分表只在初始化时整理成数组一次，之后可以快速求解大量不同的约束设置。
+    """
+
+    def __init__(self, table, weights=WEIGHTS):
+        pivot = table.pivot_table(index=['Expressor_Short', 'Gender'], columns='Expression_Type',
+                                  values=['UHR', 'Avg_Realism', 'Avg_Arousal'])
+        # 只保留五种情绪的 UHR、Realism 和 Arousal 都有定义的 Expressor
+        pivot = pivot.dropna(subset=[(col, e) for col in ['UHR', 'Avg_Arousal', 'Avg_Realism']
+                                     for e in expected_emotions])
+
+        uhr = pivot['UHR'][expected_emotions].to_numpy()
+        realism = pivot['Avg_Realism'][expected_emotions].to_numpy()
+        z_uhr = (uhr - uhr.mean()) / uhr.std(ddof=1)
+        z_realism = (realism - realism.mean()) / realism.std(ddof=1)
+
+        self.expressors = pivot.index.get_level_values('Expressor_Short').to_numpy()
+        self.genders = pivot.index.get_level_values('Gender').to_numpy()
+        self.arousal = pivot['Avg_Arousal'][expected_emotions].to_numpy()
+        self.score = (weights['UHR'] * z_uhr + weights['Realism'] * z_realism).sum(axis=1)
+        self.gender_cols = {g: np.flatnonzero(self.genders == g) for g in np.unique(self.genders)}
+
+    def default_arousal_range(self, tolerance=AROUSAL_TOLERANCE):
+        # 以整个刺激池中每种情绪的平均 Arousal 为中心的范围
+        center = self.arousal.mean(axis=0)
+        return {e: (center[k] - tolerance, center[k] + tolerance) for k, e in enumerate(expected_emotions)}
+
+    def _bounds(self, arousal_range):
+        if arousal_range is None:
+            arousal_range = self.default_arousal_range()
+        low = np.array([arousal_range[e][0] for e in expected_emotions], dtype=float)
+        high = np.array([arousal_range[e][1] for e in expected_emotions], dtype=float)
+        return low, high
+
+    @staticmethod
+    def _violation(sums, n, low, high):
+        # 平均 Arousal 超出范围的总量（0 表示满足约束），最后一维为情绪
+        mean = sums / n
+        return (np.maximum(low - mean, 0) + np.maximum(mean - high, 0)).sum(axis=-1)
+
+    def solve(self, n_per_gender=N_PER_GENDER, arousal_range=AROUSAL_RANGE, max_iter=1000):
+        """
+        先按得分贪心选出每个性别的前 n 名，再做交换局部搜索：
+        每一步对所有 (移出 i, 移入 j) 组合增量计算约束违反量和目标变化，
+        优先减少违反量，其次提高得分，直到没有改进。
+        返回 (被选中 Expressor 的下标数组, 目标值, 违反量)。
+        """
+        low, high = self._bounds(arousal_range)
+        selected = []
+        total_score = 0.0
+        total_violation = 0.0
+
+        for gender, cols in self.gender_cols.items():
+            n = min(n_per_gender, len(cols))
+            order = cols[np.argsort(-self.score[cols], kind='stable')]
+            inside, outside = order[:n].copy(), order[n:].copy()
+            sums = self.arousal[inside].sum(axis=0)
+            violation = self._violation(sums, n, low, high)
+
+            for _ in range(max_iter):
+                if len(outside) == 0:
+                    break
+                # 增量计算：sums - A[i] + A[j]，形状 (n_in, n_out, 5)
+                new_sums = sums - self.arousal[inside][:, None, :] + self.arousal[outside][None, :, :]
+                new_violation = self._violation(new_sums, n, low, high)
+                gain = self.score[outside][None, :] - self.score[inside][:, None]
+
+                better = (new_violation < violation - 1e-12) | (
+                    (np.abs(new_violation - violation) <= 1e-12) & (gain > 1e-12))
+                if not better.any():
+                    break
+                # 先比较违反量，再比较得分增益
+                key = np.where(better, -new_violation * 1e6 + gain, -np.inf)
+                i, j = np.unravel_index(np.argmax(key), key.shape)
+                sums = new_sums[i, j]
+                violation = new_violation[i, j]
+                inside[i], outside[j] = outside[j], inside[i]
+
+            selected.append(inside)
+            total_score += self.score[inside].sum()
+            total_violation += violation
+
+        return np.concatenate(selected), total_score, total_violation
+
+    def selection_table(self, selected):
+        result = pd.DataFrame({
+            'Expressor_Short': self.expressors[selected],
+            'Gender': self.genders[selected],
+            'Score': self.score[selected],
+        })
+        for k, emotion in enumerate(expected_emotions):
+            result[f'Arousal_{emotion}'] = self.arousal[selected, k]
+        return result.sort_values(['Gender', 'Score'], ascending=[True, False]).reset_index(drop=True)
+
+    def sweep(self, settings, max_iter=1000):
+        # 批量求解多组约束设置；settings 为 (n_per_gender, arousal_range) 列表
+        rows = []
+        for idx, (n_per_gender, arousal_range) in enumerate(settings):
+            selected, total_score, violation = self.solve(n_per_gender, arousal_range, max_iter)
+            rows.append({'Setting': idx, 'N_Per_Gender': n_per_gender, 'Score': total_score,
+                         'Violation': violation, 'Feasible': violation <= 1e-9,
+                         'Expressors': ','.join(sorted(self.expressors[selected]))})
+        return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    data = prepare_data(pd.read_excel(file_path))
+    table = score_table(data)
+    selector = SubsetSelector(table)
+
+    selected, total_score, violation = selector.solve()
+    selection = selector.selection_table(selected)
+    print(f"目标值: {total_score:.3f}，约束违反量: {violation:.3f}")
+    print(selection.to_string(index=False))
+
+    with ResultsWriter('stimulus_subset_selection.xlsx') as writer:
+        writer.add('item_scores', table)
+        writer.add('selected_expressors', selection)